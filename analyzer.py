@@ -1,9 +1,12 @@
 import json
 import os
 import datetime
-from typing import List, Dict, Any
+import heapq
+from urllib.parse import urlparse
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 import openai
 import re
+from enricher import StoryEnricher
 
 class HackerNewsAnalyzer:
     """分析Hacker News数据并生成报告的类"""
@@ -23,6 +26,9 @@ class HackerNewsAnalyzer:
         self.reports_dir = reports_dir if reports_dir else ANALYZER_CONFIG["reports_dir"]
         self.model = ANALYZER_CONFIG["model"]  # 存储模型名称
         self.api_base_url = ANALYZER_CONFIG["api_base_url"]  # 存储API地址
+        self.weekly_top_stories_limit = ANALYZER_CONFIG.get("weekly_top_stories_limit", 20)  # 周报故事数量
+        self.prompt_detailed_stories = ANALYZER_CONFIG.get("prompt_detailed_stories", 5)  # 提示中保留完整链接的故事数量
+        self.prefetch_weekly_candidates = ANALYZER_CONFIG.get("enrichment_prefetch_weekly_candidates", False)  # 日报是否预先为周报候选生成摘要
         
         # 确保目录存在
         os.makedirs(self.data_dir, exist_ok=True)
@@ -34,6 +40,16 @@ class HackerNewsAnalyzer:
             self.api_key = os.environ.get("OPENAI_API_KEY")
             if not self.api_key:
                 raise ValueError("需要提供OpenAI API密钥(通过参数、配置文件或环境变量)")
+        
+        # 故事摘要与标签缓存，跨日报和周报复用
+        self.enricher = None
+        if ANALYZER_CONFIG.get("enable_enrichment", True):
+            self.enricher = StoryEnricher(
+                api_key=self.api_key,
+                api_base_url=self.api_base_url,
+                model=self.model,
+                cache_file=os.path.join(self.data_dir, ANALYZER_CONFIG.get("enrichment_cache_file", "enrichments.json"))
+            )
     
     def load_daily_data(self, date_str: str = None) -> Dict[str, Any]:
         """加载指定日期的数据
@@ -56,28 +72,93 @@ class HackerNewsAnalyzer:
             print(f"找不到{date_str}的数据文件")
             return None
     
-    def get_last_n_days_data(self, n: int = 7) -> List[Dict[str, Any]]:
-        """获取最近n天的数据
-        
+    def iter_last_n_days_stories(self, n: int = 7) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+        """按日期从旧到新逐天产出最近n天的故事
+
+        每次只加载一天的数据文件，并只保留排序所需的字段，原始数据（包括嵌套评论）
+        在产出前即被释放，因此峰值内存与天数无关。
+
         Args:
             n: 天数
-            
-        Returns:
-            数据列表，按日期排序
+
+        Yields:
+            (日期字符串, 精简后的热门与最佳故事列表)
         """
-        data_list = []
         today = datetime.datetime.now()
-        
-        for i in range(n):
+
+        for i in range(n - 1, -1, -1):
             date = today - datetime.timedelta(days=i)
-            date_str = date.strftime("%Y-%m-%d")
-            data = self.load_daily_data(date_str)
-            if data:
-                data_list.append(data)
-        
-        # 按日期排序
-        data_list.sort(key=lambda x: x["date"])
-        return data_list
+            data = self.load_daily_data(date.strftime("%Y-%m-%d"))
+            if not data:
+                continue
+
+            date_str = data["date"]
+            stories = self._project_day_stories(data)
+            # 在产出前释放整天的原始数据
+            del data
+            yield date_str, stories
+
+    def aggregate_weekly_stories(self, n: int = 7, limit: int = None) -> Optional[Dict[str, Any]]:
+        """流式聚合最近n天的故事，返回得分最高的若干故事
+
+        对每个故事ID只保留得分最高的版本。候选字典超过limit的两倍时裁剪回limit，
+        被裁剪的故事得分不高于当时的第limit名，而该门槛只会上升，所以裁剪不影响结果。
+
+        Args:
+            n: 天数
+            limit: 返回的故事数量，默认使用配置文件中的设置
+
+        Returns:
+            包含start_date、end_date和stories的字典，没有数据时返回None
+        """
+        if limit is None:
+            limit = self.weekly_top_stories_limit
+
+        best_by_id = {}
+        start_date = end_date = None
+
+        for date_str, stories in self.iter_last_n_days_stories(n):
+            if start_date is None:
+                start_date = date_str
+            end_date = date_str
+
+            for story in stories:
+                current = best_by_id.get(story["id"])
+                if current is None or story["score"] > current["score"]:
+                    best_by_id[story["id"]] = story
+
+            if len(best_by_id) > limit * 2:
+                kept = heapq.nlargest(limit, best_by_id.values(), key=lambda x: x["score"])
+                best_by_id = {story["id"]: story for story in kept}
+
+        if start_date is None:
+            return None
+
+        return {
+            "start_date": start_date,
+            "end_date": end_date,
+            "stories": heapq.nlargest(limit, best_by_id.values(), key=lambda x: x["score"]),
+        }
+
+    def _project_day_stories(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """精简一天中参与周报排序的热门与最佳故事"""
+        return [
+            self._project_story(story)
+            for key in ("top_stories", "best_stories")
+            for story in data.get(key, [])
+            if "id" in story
+        ]
+    
+    @staticmethod
+    def _project_story(story: Dict[str, Any]) -> Dict[str, Any]:
+        """只保留生成报告所需的故事字段"""
+        return {
+            "id": story["id"],
+            "title": story.get("title", "无标题"),
+            "url": story.get("url", ""),
+            "score": story.get("score", 0),
+            "descendants": story.get("descendants", 0),
+        }
     
     def generate_daily_report(self, date_str: str = None) -> str:
         """生成每日报告
@@ -96,8 +177,14 @@ class HackerNewsAnalyzer:
         if not data:
             return f"无法生成{date_str}的报告：找不到数据"
         
+        # 获取故事摘要和标签（只为未缓存的故事调用LLM）
+        stories = self._select_daily_stories(data)
+        if self.prefetch_weekly_candidates:
+            stories += self._select_weekly_candidates(data)
+        enrichments = self._enrich_stories(stories)
+        
         # 准备提示
-        prompt = self._prepare_daily_prompt(data)
+        prompt = self._prepare_daily_prompt(data, enrichments)
         
         # 调用AI生成报告 (更新为v1.0.0+ API)
         try:
@@ -129,13 +216,16 @@ class HackerNewsAnalyzer:
         Returns:
             生成的报告文本
         """
-        # 获取过去7天的数据
-        data_list = self.get_last_n_days_data(7)
-        if not data_list:
+        # 流式聚合过去7天的数据
+        weekly = self.aggregate_weekly_stories(7)
+        if not weekly:
             return "无法生成周报：找不到数据"
         
+        # 获取故事摘要和标签（只为未缓存的故事调用LLM）
+        enrichments = self._enrich_stories(weekly["stories"])
+        
         # 准备提示
-        prompt = self._prepare_weekly_prompt(data_list)
+        prompt = self._prepare_weekly_prompt(weekly, enrichments)
         
         # 调用AI生成报告 (更新为v1.0.0+ API)
         try:
@@ -164,34 +254,62 @@ class HackerNewsAnalyzer:
         
         return report
     
-    def _prepare_daily_prompt(self, data: Dict[str, Any]) -> str:
+    def _select_daily_stories(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """选出日报中列出的得分最高的10个热门故事（精简字段）
+        
+        Args:
+            data: 当日数据
+            
+        Returns:
+            精简后的故事列表，按得分从高到低排序
+        """
+        top_stories = [story for story in data["top_stories"] if "id" in story]
+        top_10 = sorted(top_stories, key=lambda x: x.get("score", 0), reverse=True)[:10]
+        return [self._project_story(story) for story in top_10]
+    
+    def _select_weekly_candidates(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """选出当天可能进入周报的故事（精简字段）
+        
+        周报对每个故事ID取得分最高的版本，再取得分前limit名。如果一个故事在当天的热门与最佳故事中
+        排不进前limit名，当天就已有limit个得分更高的其他故事，它不可能进入周报。开启
+        enrichment_prefetch_weekly_candidates时，日报会为这些候选预先生成摘要，周报即可全部命中缓存，
+        代价是每天多处理最多limit个故事；默认关闭，由周报自己补齐缺少的摘要。
+        
+        Args:
+            data: 当日数据
+            
+        Returns:
+            当天得分最高的limit个故事，每个故事ID只保留得分最高的版本
+        """
+        best_by_id = {}
+        for story in self._project_day_stories(data):
+            current = best_by_id.get(story["id"])
+            if current is None or story["score"] > current["score"]:
+                best_by_id[story["id"]] = story
+        return heapq.nlargest(self.weekly_top_stories_limit, best_by_id.values(), key=lambda x: x["score"])
+    
+    def _prepare_daily_prompt(self, data: Dict[str, Any], enrichments: Dict[int, Dict[str, Any]] = None) -> str:
         """准备每日报告的提示
         
         Args:
             data: 当日数据
+            enrichments: 故事ID到摘要和标签的映射
             
         Returns:
             提示文本
         """
         date = data["date"]
-        top_stories = data["top_stories"]
-        new_stories = data["new_stories"]
-        best_stories = data["best_stories"]
+        enrichments = enrichments or {}
         
         # 提取最重要的信息
-        top_10 = sorted(top_stories, key=lambda x: x.get("score", 0), reverse=True)[:10]
+        top_10 = self._select_daily_stories(data)
         
         prompt = f"""请根据以下Hacker News数据，生成{date}的每日技术新闻摘要报告。
 
 今日热门故事TOP 10：
 """
         
-        for i, story in enumerate(top_10, 1):
-            title = story.get("title", "无标题")
-            url = story.get("url", "")
-            score = story.get("score", 0)
-            comments = story.get("descendants", 0)
-            prompt += f"{i}. {title} (得分: {score}, 评论: {comments})\n   链接: {url}\n\n"
+        prompt += self._format_story_list(top_10, enrichments)
         
         prompt += """请提供以下内容：
 1. 今日热点概述：简要总结今天Hacker News上的主要热点和趋势。
@@ -203,44 +321,27 @@ class HackerNewsAnalyzer:
         
         return prompt
     
-    def _prepare_weekly_prompt(self, data_list: List[Dict[str, Any]]) -> str:
+    def _prepare_weekly_prompt(self, weekly: Dict[str, Any], enrichments: Dict[int, Dict[str, Any]] = None) -> str:
         """准备每周报告的提示
         
         Args:
-            data_list: 一周的数据列表
+            weekly: aggregate_weekly_stories返回的聚合结果
+            enrichments: 故事ID到摘要和标签的映射
             
         Returns:
             提示文本
         """
-        start_date = data_list[0]["date"]
-        end_date = data_list[-1]["date"]
-        
-        # 合并所有故事
-        all_stories = []
-        for data in data_list:
-            all_stories.extend(data["top_stories"])
-            all_stories.extend(data["best_stories"])
-        
-        # 去重（按ID）
-        unique_stories = {}
-        for story in all_stories:
-            if "id" in story and story["id"] not in unique_stories:
-                unique_stories[story["id"]] = story
-        
-        # 按得分排序取前20
-        top_20 = sorted(unique_stories.values(), key=lambda x: x.get("score", 0), reverse=True)[:20]
+        start_date = weekly["start_date"]
+        end_date = weekly["end_date"]
+        top_stories = weekly["stories"]
+        enrichments = enrichments or {}
         
         prompt = f"""请根据以下Hacker News数据，生成{start_date}至{end_date}的每周技术新闻摘要报告。
 
-本周热门故事TOP 20：
+本周热门故事TOP {len(top_stories)}：
 """
         
-        for i, story in enumerate(top_20, 1):
-            title = story.get("title", "无标题")
-            url = story.get("url", "")
-            score = story.get("score", 0)
-            comments = story.get("descendants", 0)
-            prompt += f"{i}. {title} (得分: {score}, 评论: {comments})\n   链接: {url}\n\n"
+        prompt += self._format_story_list(top_stories, enrichments)
         
         prompt += """请提供以下内容：
 1. 本周热点概述：简要总结本周Hacker News上的主要热点和趋势。
@@ -254,6 +355,67 @@ class HackerNewsAnalyzer:
         
         return prompt
     
+    def _enrich_stories(self, stories: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+        """获取故事的缓存摘要和标签，未缓存的故事会被批量生成
+        
+        Args:
+            stories: 经_project_story精简后的故事列表，保证日报和周报的内容哈希一致
+            
+        Returns:
+            故事ID到摘要和标签的映射，未启用缓存时返回空字典
+        """
+        if not self.enricher:
+            return {}
+        return self.enricher.enrich(stories)
+    
+    def _format_story_list(self, stories: List[Dict[str, Any]], enrichments: Dict[int, Dict[str, Any]]) -> str:
+        """将故事列表格式化为提示文本
+        
+        每行都保留标题、得分和评论数。排名前prompt_detailed_stories的故事保留完整链接供推荐阅读使用；
+        其余已有缓存摘要的故事用域名和简短摘要代替完整链接，标签合并为末尾的一行统计。
+        没有摘要的故事沿用原来的格式。
+        
+        Args:
+            stories: 按得分排序的故事列表
+            enrichments: 故事ID到摘要和标签的映射
+            
+        Returns:
+            提示文本
+        """
+        text = ""
+        tag_counts = {}
+        for i, story in enumerate(stories, 1):
+            title = story.get("title", "无标题")
+            url = story.get("url", "")
+            score = story.get("score", 0)
+            comments = story.get("descendants", 0)
+            enrichment = enrichments.get(story.get("id"))
+            
+            if not enrichment:
+                text += f"{i}. {title} (得分: {score}, 评论: {comments})\n   链接: {url}\n\n"
+                continue
+            
+            for tag in enrichment["tags"]:
+                tag_counts[tag] = tag_counts.get(tag, 0) + 1
+            
+            if i <= self.prompt_detailed_stories:
+                text += f"{i}. {title} ({score}分, {comments}评)\n   {url}\n"
+            else:
+                domain = urlparse(url).netloc
+                if domain.startswith("www."):
+                    domain = domain[4:]
+                source = f"{domain}, " if domain else ""
+                text += f"{i}. {title} ({source}{score}分, {comments}评) {enrichment['summary']}\n"
+        
+        if tag_counts:
+            ranked = sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)
+            text += "主题标签: " + ", ".join(f"{tag}({count})" for tag, count in ranked) + "\n"
+        
+        # 与后续说明之间保留一个空行
+        if not text.endswith("\n\n"):
+            text += "\n"
+        return text
+    
     def _save_report(self, report: str, date_str: str, report_type: str):
         """保存报告
         
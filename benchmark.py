@@ -0,0 +1,150 @@
+import argparse
+import datetime
+import json
+import os
+import random
+import tempfile
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from analyzer import HackerNewsAnalyzer
+
+
+def make_story(story_id: int, comments_per_story: int, comment_depth: int) -> Dict[str, Any]:
+    """生成一个带嵌套评论的模拟故事"""
+    def make_comment(comment_id: int, depth: int) -> Dict[str, Any]:
+        comment = {
+            "by": f"user{comment_id}",
+            "id": comment_id,
+            "text": "lorem ipsum " * 40,
+            "time": 1744851349,
+            "type": "comment",
+            "kids": list(range(comment_id * 10, comment_id * 10 + 20)),
+        }
+        if depth > 1:
+            comment["comments"] = [make_comment(comment_id * 10 + k, depth - 1) for k in range(3)]
+        return comment
+
+    return {
+        "by": f"author{story_id}",
+        "descendants": random.randint(0, 500),
+        "id": story_id,
+        "kids": list(range(story_id * 100, story_id * 100 + 50)),
+        "score": random.randint(1, 2000),
+        "time": 1744851349,
+        "title": f"Story {story_id}",
+        "type": "story",
+        "url": f"https://example.com/{story_id}",
+        "comments": [make_comment(story_id * 100 + k, comment_depth) for k in range(comments_per_story)],
+    }
+
+
+def write_fake_data(data_dir: str, days: int, stories_per_day: int, comments_per_story: int, comment_depth: int):
+    """在data_dir中写入最近days天的模拟数据文件"""
+    today = datetime.datetime.now()
+    for i in range(days):
+        date_str = (today - datetime.timedelta(days=i)).strftime("%Y-%m-%d")
+        # 每天约一半的故事与前一天重复，模拟热门故事跨天出现
+        base_id = i * stories_per_day // 2
+        stories = [make_story(base_id + j, comments_per_story, comment_depth) for j in range(stories_per_day)]
+        data = {
+            "date": date_str,
+            "timestamp": today.timestamp(),
+            "top_stories": stories[:stories_per_day // 2],
+            "new_stories": [],
+            "best_stories": stories[stories_per_day // 2:],
+        }
+        with open(os.path.join(data_dir, f"{date_str}.json"), 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+
+
+def load_last_n_days_data(analyzer: HackerNewsAnalyzer, n: int) -> List[Dict[str, Any]]:
+    """旧的加载方式：一次性把最近n天的完整数据（包括嵌套评论）加载到内存中"""
+    data_list = []
+    today = datetime.datetime.now()
+    for i in range(n):
+        date_str = (today - datetime.timedelta(days=i)).strftime("%Y-%m-%d")
+        data = analyzer.load_daily_data(date_str)
+        if data:
+            data_list.append(data)
+    data_list.sort(key=lambda x: x["date"])
+    return data_list
+
+
+def eager_weekly(analyzer: HackerNewsAnalyzer, days: int, limit: int = 20) -> List[Dict[str, Any]]:
+    """一次性加载所有天的数据，逐个ID取得分最高的版本后排序，作为流式聚合的对照"""
+    best_by_id = {}
+    for data in load_last_n_days_data(analyzer, days):
+        for story in data["top_stories"] + data["best_stories"]:
+            if "id" not in story:
+                continue
+            current = best_by_id.get(story["id"])
+            if current is None or story.get("score", 0) > current.get("score", 0):
+                best_by_id[story["id"]] = story
+    return sorted(best_by_id.values(), key=lambda x: x.get("score", 0), reverse=True)[:limit]
+
+
+def streaming_weekly(analyzer: HackerNewsAnalyzer, days: int) -> List[Dict[str, Any]]:
+    """流式聚合实现"""
+    return analyzer.aggregate_weekly_stories(days)["stories"]
+
+
+def check_streaming_matches_eager(analyzer: HackerNewsAnalyzer, days: int, limit: int):
+    """检查流式聚合（含裁剪）的结果与一次性加载后的暴力计算一致
+
+    得分相同的故事顺序可能不同，所以比较得分序列，并检查每个故事都是该ID得分最高的版本。
+    """
+    expected = eager_weekly(analyzer, days, limit)
+    actual = analyzer.aggregate_weekly_stories(days, limit)["stories"]
+
+    best_scores = {}
+    for data in load_last_n_days_data(analyzer, days):
+        for story in data["top_stories"] + data["best_stories"]:
+            best_scores[story["id"]] = max(best_scores.get(story["id"], 0), story["score"])
+
+    assert [s["score"] for s in actual] == [s["score"] for s in expected], f"{days}天窗口的得分序列不一致"
+    assert len({s["id"] for s in actual}) == len(actual), f"{days}天窗口的结果中有重复的故事"
+    assert all(s["score"] == best_scores[s["id"]] for s in actual), f"{days}天窗口未取得分最高的版本"
+
+
+def measure_peak(func: Callable[[], Any]) -> float:
+    """返回执行func时的峰值内存（MB）"""
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="周报聚合的内存基准测试")
+    parser.add_argument("--windows", type=int, nargs="+", default=[7, 14, 28], help="要测试的天数窗口")
+    parser.add_argument("--stories", type=int, default=500, help="每天的故事数量")
+    parser.add_argument("--comments", type=int, default=3, help="每个故事的顶层评论数量")
+    parser.add_argument("--depth", type=int, default=2, help="评论嵌套深度")
+    args = parser.parse_args()
+
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_dir = os.path.join(tmp_dir, "data")
+        reports_dir = os.path.join(tmp_dir, "reports")
+        os.makedirs(data_dir)
+        write_fake_data(data_dir, max(args.windows), args.stories, args.comments, args.depth)
+
+        analyzer = HackerNewsAnalyzer(data_dir=data_dir, reports_dir=reports_dir, api_key="benchmark")
+
+        # 每天的故事数多于limit的两倍时（默认500个），每天都会触发裁剪
+        for days in args.windows:
+            for limit in (5, 20):
+                check_streaming_matches_eager(analyzer, days, limit)
+        print("流式聚合结果与暴力计算一致")
+
+        print(f"{'天数':>6} {'一次性加载(MB)':>16} {'流式聚合(MB)':>14}")
+        for days in args.windows:
+            eager_peak = measure_peak(lambda: eager_weekly(analyzer, days))
+            streaming_peak = measure_peak(lambda: streaming_weekly(analyzer, days))
+            print(f"{days:>6} {eager_peak:>16.1f} {streaming_peak:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -23,9 +23,20 @@ ANALYZER_CONFIG = {
     "model": "deepseek-chat",           # 使用的模型
     "daily_max_tokens": 2000,   # 每日报告最大token数
     "weekly_max_tokens": 3000,  # 每周报告最大token数
+    "weekly_top_stories_limit": 20,  # 周报中列出的故事数量
     "temperature": 0.7,         # 生成文本的创造性程度
     "api_base_url": "https://api.deepseek.com/v1",  # DeepSeek API地址
-    "api_key": "your_api_key"  # 新增API密钥配置
+    "api_key": "your_api_key",  # 新增API密钥配置
+
+    # 故事摘要与标签缓存配置
+    "enable_enrichment": True,  # 是否为故事生成摘要和标签
+    "enrichment_cache_file": "enrichments.json",  # 缓存文件名，位于数据目录下
+    "enrichment_batch_size": 10,  # 每次LLM请求处理的故事数量
+    "enrichment_max_tokens": 2000,  # 每次批量请求的最大token数
+    "enrichment_summary_max_words": 8,  # 摘要的最大英文单词数，超出部分会被截断
+    "enrichment_cache_days": 30,  # 缓存中超过该天数未用到的故事会被清理
+    "enrichment_prefetch_weekly_candidates": False,  # 日报是否预先为当天可能进入周报的故事生成摘要
+    "prompt_detailed_stories": 5  # 有摘要时，提示中保留完整链接的故事数量，其余故事用域名和摘要代替链接
 }
 
 # 调度器配置
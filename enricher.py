@@ -0,0 +1,229 @@
+import json
+import os
+import re
+import datetime
+import hashlib
+from typing import List, Dict, Any, Optional
+import openai
+
+class StoryEnricher:
+    """为每个故事生成摘要和主题标签，并按故事ID持久化缓存的类"""
+
+    def __init__(self, api_key: str, api_base_url: str, model: str, cache_file: str, batch_size: int = None):
+        """初始化增强器
+
+        Args:
+            api_key: OpenAI API密钥
+            api_base_url: API地址
+            model: 使用的模型名称
+            cache_file: 缓存文件路径
+            batch_size: 每次LLM请求处理的故事数量，默认使用配置文件中的设置
+        """
+        from config import ANALYZER_CONFIG
+
+        self.api_key = api_key
+        self.api_base_url = api_base_url
+        self.model = model
+        self.cache_file = cache_file
+        self.batch_size = batch_size if batch_size else ANALYZER_CONFIG.get("enrichment_batch_size", 10)
+        self.max_tokens = ANALYZER_CONFIG.get("enrichment_max_tokens", 2000)
+        self.summary_max_words = ANALYZER_CONFIG.get("enrichment_summary_max_words", 8)
+        self.cache_days = ANALYZER_CONFIG.get("enrichment_cache_days", 30)
+
+        cache_dir = os.path.dirname(self.cache_file)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        self.cache = self._load_cache()
+
+    @staticmethod
+    def content_hash(story: Dict[str, Any]) -> str:
+        """计算故事内容的哈希值，标题或链接变化时缓存失效
+
+        传入的故事应先经过HackerNewsAnalyzer._project_story精简，以保证缺省字段的取值一致。
+        """
+        content = f"{story.get('title', '')}\n{story.get('url', '')}"
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+
+    def get_cached(self, story: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """返回故事的缓存增强结果，未命中或内容已变化时返回None"""
+        entry = self.cache.get(str(story.get("id")))
+        if isinstance(entry, dict) and entry.get("hash") == self.content_hash(story):
+            return entry
+        return None
+
+    def enrich(self, stories: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+        """获取故事的摘要和标签，只对未缓存的故事调用LLM
+
+        用到的缓存条目会记录当天日期，超过cache_days天未用到的条目会被清理，缓存文件每次调用最多写一次。
+
+        Args:
+            stories: 故事列表，每个故事至少包含id和title
+
+        Returns:
+            故事ID到增强结果（summary、tags）的映射，生成失败的故事不包含在内
+        """
+        missing = []
+        seen_ids = set()
+        for story in stories:
+            if "id" not in story or story["id"] in seen_ids:
+                continue
+            seen_ids.add(story["id"])
+            if self.get_cached(story) is None:
+                missing.append(story)
+
+        today = datetime.datetime.now().strftime("%Y-%m-%d")
+        changed = False
+
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            results = self._enrich_batch(batch)
+            for story in batch:
+                result = results.get(story["id"])
+                if result:
+                    self.cache[str(story["id"])] = {
+                        "hash": self.content_hash(story),
+                        "summary": result["summary"],
+                        "tags": result["tags"],
+                        "last_seen": today
+                    }
+                    changed = True
+
+        enrichments = {}
+        for story in stories:
+            entry = self.get_cached(story) if "id" in story else None
+            if entry:
+                if entry.get("last_seen") != today:
+                    entry["last_seen"] = today
+                    changed = True
+                enrichments[story["id"]] = {"summary": entry["summary"], "tags": entry["tags"]}
+
+        if self._prune_cache() or changed:
+            self._save_cache()
+        return enrichments
+
+    def _enrich_batch(self, batch: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+        """用一次LLM请求为一批故事生成摘要和标签
+
+        Args:
+            batch: 需要增强的故事列表
+
+        Returns:
+            故事ID到增强结果的映射，请求或解析失败时返回空字典
+        """
+        prompt = self._prepare_enrich_prompt(batch)
+
+        try:
+            client = openai.OpenAI(
+                api_key=self.api_key,
+                base_url=self.api_base_url
+            )
+            response = client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": "你是一个专业的技术新闻分析师，只输出JSON。"},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.3,
+                max_tokens=self.max_tokens
+            )
+            content = response.choices[0].message.content
+        except Exception as e:
+            print(f"生成故事摘要时出错：{str(e)}")
+            return {}
+
+        return self._parse_enrich_response(content, {story["id"] for story in batch})
+
+    def _prepare_enrich_prompt(self, batch: List[Dict[str, Any]]) -> str:
+        """准备批量增强的提示
+
+        Args:
+            batch: 需要增强的故事列表
+
+        Returns:
+            提示文本
+        """
+        prompt = f"请用一句不超过{self.summary_max_words}个单词的英文概括以下每个Hacker News故事，并给出1-3个英文小写主题标签。\n"
+        prompt += """只输出一个JSON数组，每个元素形如 {"id": 故事ID, "summary": "摘要", "tags": ["标签"]}，不要输出其他内容。
+
+"""
+        for story in batch:
+            prompt += f"ID: {story['id']}\n标题: {story.get('title', '无标题')}\n链接: {story.get('url', '')}\n\n"
+
+        return prompt
+
+    def _parse_enrich_response(self, content: str, expected_ids: set) -> Dict[int, Dict[str, Any]]:
+        """解析LLM返回的JSON数组，忽略格式不正确或不属于本批次的条目"""
+        # 从回复中提取JSON数组，回复可能被Markdown代码块包裹
+        match = re.search(r"\[.*\]", content or "", re.S)
+        if not match:
+            print("无法解析故事摘要结果：未找到JSON数组")
+            return {}
+
+        try:
+            items = json.loads(match.group(0))
+        except json.JSONDecodeError as e:
+            print(f"无法解析故事摘要结果：{e}")
+            return {}
+
+        results = {}
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            try:
+                story_id = int(item.get("id"))
+            except (TypeError, ValueError):
+                continue
+            summary = item.get("summary")
+            tags = item.get("tags")
+            if story_id not in expected_ids or not isinstance(summary, str) or not isinstance(tags, list):
+                continue
+            # 限制摘要长度，避免模型输出过长的摘要抵消提示中节省的token
+            words = summary.split()
+            results[story_id] = {
+                "summary": " ".join(words[:self.summary_max_words]),
+                "tags": [str(tag).lower() for tag in tags[:3]]
+            }
+
+        return results
+
+    def _load_cache(self) -> Dict[str, Any]:
+        """加载缓存文件"""
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except json.JSONDecodeError as e:
+            print(f"缓存文件 {self.cache_file} 已损坏，将重新生成: {e}")
+            return {}
+
+        if not isinstance(cache, dict):
+            print(f"缓存文件 {self.cache_file} 格式不正确，将重新生成")
+            return {}
+        return cache
+
+    def _prune_cache(self) -> bool:
+        """清理超过cache_days天未用到的缓存条目
+
+        Returns:
+            是否有条目被清理
+        """
+        cutoff = (datetime.datetime.now() - datetime.timedelta(days=self.cache_days)).strftime("%Y-%m-%d")
+        stale = [
+            story_id for story_id, entry in self.cache.items()
+            if not isinstance(entry, dict) or entry.get("last_seen", "") < cutoff
+        ]
+        for story_id in stale:
+            del self.cache[story_id]
+        return bool(stale)
+
+    def _save_cache(self):
+        """保存缓存文件，先写临时文件再替换以免中途失败损坏缓存；写入失败时只打印错误"""
+        tmp_path = f"{self.cache_file}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.cache, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_file)
+        except OSError as e:
+            print(f"保存缓存文件 {self.cache_file} 失败: {e}")
@@ -0,0 +1,263 @@
+import datetime
+import json
+import os
+import re
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Any, Dict, List
+
+import config
+from analyzer import HackerNewsAnalyzer
+
+try:
+    from deepseek_tokenizer import ds_token
+except ImportError:
+    ds_token = None
+
+SAMPLE_DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "2025-04-17.json")
+
+# 模拟的摘要和标签，长度与真实模型在摘要长度上限内的输出相当
+FAKE_SUMMARIES = [
+    "Registrar mistakenly suspended the domain, taking the service offline for most users worldwide.",
+    "Author argues incremental product improvements often beat radical redesigns that users never asked for.",
+    "Support bot invented a login policy, prompting cancellations and debate about AI customer service.",
+    "University publishes its legal response rejecting federal demands over admissions, hiring and governance.",
+    "Funding lapse threatens the CVE vulnerability database that security teams rely on daily.",
+    "New open-source release adds faster builds, better type inference and simpler plugin APIs.",
+]
+FAKE_TAGS = ["security", "ai", "open-source", "policy", "outage", "programming", "startups", "hardware", "web"]
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    """模拟OpenAI chat completions接口的本地服务，记录收到的每个请求"""
+
+    requests: List[Dict[str, Any]] = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        system_prompt = body["messages"][0]["content"]
+        prompt = body["messages"][-1]["content"]
+
+        if "JSON" in system_prompt:
+            ids = [int(i) for i in re.findall(r"^ID: (\d+)$", prompt, re.M)]
+            self.requests.append({"kind": "enrich", "prompt": prompt, "ids": ids})
+            items = [
+                {
+                    "id": story_id,
+                    "summary": FAKE_SUMMARIES[story_id % len(FAKE_SUMMARIES)],
+                    "tags": [FAKE_TAGS[(story_id + k) % len(FAKE_TAGS)] for k in range(story_id % 3 + 1)]
+                }
+                for story_id in ids
+            ]
+            content = "```json\n" + json.dumps(items, ensure_ascii=False) + "\n```"
+        else:
+            self.requests.append({"kind": "report", "prompt": prompt})
+            content = "模拟报告"
+
+        payload = json.dumps({
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": 0,
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def count_tokens(text: str) -> int:
+    """统计token数：安装了deepseek_tokenizer时使用DeepSeek分词器，否则按每个汉字1个、其他每4个字符1个估算"""
+    if ds_token is not None:
+        return len(ds_token.encode(text))
+    cjk = len(re.findall(r"[一-鿿　-〿＀-￯]", text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def take_requests(kind: str = None) -> List[Dict[str, Any]]:
+    """取出并清空已记录的请求，可按类型过滤"""
+    recorded = [r for r in FakeLLMHandler.requests if kind is None or r["kind"] == kind]
+    FakeLLMHandler.requests.clear()
+    return recorded
+
+
+def prompt_tokens(requests: List[Dict[str, Any]]) -> int:
+    """统计一组请求的提示token总数"""
+    return sum(count_tokens(r["prompt"]) for r in requests)
+
+
+def write_week_of_sample_data(data_dir: str) -> List[str]:
+    """把仓库自带的示例数据复制为最近7天的数据文件，返回日期列表（从旧到新）"""
+    with open(SAMPLE_DATA_FILE, 'r', encoding='utf-8') as f:
+        sample = json.load(f)
+
+    today = datetime.datetime.now()
+    dates = []
+    for i in range(6, -1, -1):
+        date_str = (today - datetime.timedelta(days=i)).strftime("%Y-%m-%d")
+        sample["date"] = date_str
+        with open(os.path.join(data_dir, f"{date_str}.json"), 'w', encoding='utf-8') as f:
+            json.dump(sample, f, ensure_ascii=False)
+        dates.append(date_str)
+    return dates
+
+
+def make_analyzer(tmp_dir: str, enable_enrichment: bool, prefetch: bool = False) -> HackerNewsAnalyzer:
+    """创建指向临时目录的分析器"""
+    config.ANALYZER_CONFIG["enable_enrichment"] = enable_enrichment
+    config.ANALYZER_CONFIG["enrichment_prefetch_weekly_candidates"] = prefetch
+    return HackerNewsAnalyzer(
+        data_dir=os.path.join(tmp_dir, "data"),
+        reports_dir=os.path.join(tmp_dir, "reports"),
+        api_key="fake"
+    )
+
+
+def check_default_flow(tmp_dir: str, batch_size: int) -> Dict[str, int]:
+    """默认配置：日报和周报只为未见过的故事生成摘要，返回各阶段的token统计"""
+    dates = write_week_of_sample_data(os.path.join(tmp_dir, "data"))
+
+    # 基线：不使用摘要缓存时的周报提示
+    make_analyzer(tmp_dir, enable_enrichment=False).generate_weekly_report()
+    baseline = prompt_tokens(take_requests())
+
+    analyzer = make_analyzer(tmp_dir, enable_enrichment=True)
+
+    # 第一份日报：多个故事合并为一次请求
+    analyzer.generate_daily_report(dates[0])
+    enrich_requests = take_requests("enrich")
+    assert enrich_requests, "第一份日报应当生成摘要"
+    assert len(enrich_requests[0]["ids"]) == batch_size, "每次请求应包含一整批故事"
+    enriched_ids = {i for r in enrich_requests for i in r["ids"]}
+    assert len(enrich_requests) == -(-len(enriched_ids) // batch_size), "故事应被合并为最少的请求数"
+
+    # 之后的日报内容相同，全部命中缓存
+    for date_str in dates[1:]:
+        analyzer.generate_daily_report(date_str)
+        assert not take_requests("enrich"), f"{date_str}的日报不应重复生成摘要"
+
+    # 周报只为日报中没有出现过的故事生成摘要
+    analyzer.generate_weekly_report()
+    first_weekly = take_requests()
+    weekly_enrich = [r for r in first_weekly if r["kind"] == "enrich"]
+    assert not {i for r in weekly_enrich for i in r["ids"]} & enriched_ids, "周报不应重复生成日报中已有的摘要"
+
+    # 新的分析器实例从磁盘加载缓存
+    rerun = make_analyzer(tmp_dir, enable_enrichment=True)
+    rerun.generate_weekly_report()
+    cached_weekly = take_requests()
+    assert not [r for r in cached_weekly if r["kind"] == "enrich"], "重新运行时不应再生成摘要"
+
+    return {
+        "baseline": baseline,
+        "first_weekly_enrich": prompt_tokens(weekly_enrich),
+        "first_weekly_enrich_requests": len(weekly_enrich),
+        "cached_weekly": prompt_tokens(cached_weekly),
+    }
+
+
+def check_prefetch_flow(tmp_dir: str):
+    """开启预取时，日报已覆盖周报的所有候选，周报不再生成摘要"""
+    dates = write_week_of_sample_data(os.path.join(tmp_dir, "data"))
+    analyzer = make_analyzer(tmp_dir, enable_enrichment=True, prefetch=True)
+    for date_str in dates:
+        analyzer.generate_daily_report(date_str)
+    take_requests()
+    analyzer.generate_weekly_report()
+    assert not take_requests("enrich"), "开启预取后周报不应再生成摘要"
+
+
+def check_cache_maintenance(tmp_dir: str):
+    """检查缓存失效、清理、写入次数和写入失败时的处理"""
+    write_week_of_sample_data(os.path.join(tmp_dir, "data"))
+    analyzer = make_analyzer(tmp_dir, enable_enrichment=True)
+    enricher = analyzer.enricher
+    story = analyzer.aggregate_weekly_stories(7)["stories"][0]
+    enricher.enrich([story])
+    take_requests()
+    assert enricher.get_cached(story) is not None
+
+    # 标题或链接变化后缓存失效
+    changed = dict(story, title=story["title"] + " (updated)")
+    assert enricher.get_cached(changed) is None
+    enricher.enrich([changed])
+    assert [r["ids"] for r in take_requests("enrich")] == [[story["id"]]], "标题变化后应重新生成摘要"
+    moved = dict(changed, url=story["url"] + "?moved")
+    enricher.enrich([moved])
+    assert [r["ids"] for r in take_requests("enrich")] == [[story["id"]]], "链接变化后应重新生成摘要"
+
+    # 摘要被截断到上限
+    assert len(enricher.get_cached(moved)["summary"].split()) <= enricher.summary_max_words
+
+    # 多批请求只写一次缓存文件
+    saves = []
+    original_save = enricher._save_cache
+    enricher._save_cache = lambda: saves.append(1) or original_save()
+    stories = analyzer.aggregate_weekly_stories(7, limit=25)["stories"]
+    enricher.enrich([dict(s, title=s["title"] + " v2") for s in stories])
+    assert len(take_requests("enrich")) > 1 and len(saves) == 1, "一次enrich调用应只写一次缓存"
+    enricher._save_cache = original_save
+
+    # 超过cache_days天未用到的条目被清理
+    stale_date = (datetime.datetime.now() - datetime.timedelta(days=enricher.cache_days + 1)).strftime("%Y-%m-%d")
+    enricher.cache["1"] = {"hash": "x", "summary": "old", "tags": [], "last_seen": stale_date}
+    enricher.enrich([])
+    assert "1" not in enricher.cache, "过期的缓存条目应被清理"
+
+    # 写入失败只打印错误，不中断报告生成
+    enricher.cache_file = os.path.join(tmp_dir, "data")
+    enricher.enrich([dict(story, title=story["title"] + " v3")])
+    take_requests()
+
+    # 损坏或格式不正确的缓存文件不影响初始化
+    cache_file = os.path.join(tmp_dir, "data", "enrichments.json")
+    with open(cache_file, 'w', encoding='utf-8') as f:
+        json.dump(["not", "a", "dict"], f)
+    assert make_analyzer(tmp_dir, enable_enrichment=True).enricher.cache == {}
+
+    # 旧的配置文件中没有新增的配置项时仍可初始化
+    batch_size = config.ANALYZER_CONFIG.pop("enrichment_batch_size")
+    try:
+        assert make_analyzer(tmp_dir, enable_enrichment=True).enricher.batch_size == 10
+    finally:
+        config.ANALYZER_CONFIG["enrichment_batch_size"] = batch_size
+
+
+def main():
+    server = HTTPServer(("127.0.0.1", 0), FakeLLMHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    config.ANALYZER_CONFIG["api_base_url"] = f"http://127.0.0.1:{server.server_port}/v1"
+    batch_size = config.ANALYZER_CONFIG.get("enrichment_batch_size", 10)
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.makedirs(os.path.join(tmp_dir, "data"))
+            stats = check_default_flow(tmp_dir, batch_size)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.makedirs(os.path.join(tmp_dir, "data"))
+            check_prefetch_flow(tmp_dir)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.makedirs(os.path.join(tmp_dir, "data"))
+            check_cache_maintenance(tmp_dir)
+    finally:
+        server.shutdown()
+
+    tokenizer = "DeepSeek分词器" if ds_token is not None else "估算"
+    baseline = stats["baseline"]
+    cached = stats["cached_weekly"]
+    first = cached + stats["first_weekly_enrich"]
+    print(f"周报提示token（{tokenizer}）: 基线 {baseline}，命中缓存后 {cached}（{cached / baseline - 1:+.0%}）")
+    print(f"首次周报另需{stats['first_weekly_enrich_requests']}次摘要请求，合计 {first}（{first / baseline - 1:+.0%}）")
+    assert cached < baseline, "命中缓存后的周报提示应比基线短"
+    print("全部检查通过")
+
+
+if __name__ == "__main__":
+    main()